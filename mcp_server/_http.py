@@ -0,0 +1,30 @@
+import atexit
+import httpx
+
+_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+# Shared keep-alive client so back-to-back calls reuse connections
+# instead of paying a fresh TCP+TLS handshake each time.
+HTTP = httpx.Client(
+    http2=True,
+    timeout=30,
+    follow_redirects=True,
+    limits=_LIMITS,
+)
+
+atexit.register(HTTP.close)
+
+# Async counterpart, created lazily because its connection pool is bound to
+# the event loop it is first used in (the server's loop).
+_async_client = None
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            follow_redirects=True,
+            limits=_LIMITS,
+        )
+    return _async_client
@@ -0,0 +1,37 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+class DomainLimiter:
+    """
+    Per-domain spacing for outgoing requests plus a global concurrency cap.
+    Requests to the same host start at least min_interval_ms apart, while
+    requests to different hosts proceed in parallel.
+    """
+
+    def __init__(self, min_interval_ms: int = 200, max_concurrency: int = 16):
+        self.min_interval = min_interval_ms / 1000
+        self._last_time: Dict[str, float] = {}
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def limit(self, domain: str) -> AsyncIterator[None]:
+        # The start time is recorded only once a global slot is held, so
+        # queueing on the semaphore can't bunch up same-host requests. A
+        # request that is too early gives its slot back before sleeping, so
+        # waits on one host never hold up requests to other hosts.
+        while True:
+            await self._sem.acquire()
+            # No await between the check and the update, so no lock is needed
+            now = time.monotonic()
+            wait = self._last_time.get(domain, now - self.min_interval) + self.min_interval - now
+            if wait <= 0:
+                self._last_time[domain] = now
+                break
+            self._sem.release()
+            await asyncio.sleep(wait)
+        try:
+            yield
+        finally:
+            self._sem.release()
@@ -1,14 +1,48 @@
-from typing import List
-import requests
+import asyncio
+import json
+from collections import OrderedDict
+from typing import List, Optional
+import httpx
 
-def _crossref_lookup(identifier: str):
+try:
+    from ._http import get_async_client
+except ImportError:
+    from _http import get_async_client
+
+# Crossref records rarely change; remember the most recent lookups for the
+# session. Values are JSON strings so callers always get a fresh dict.
+_CACHE_MAXSIZE = 512
+_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def _cache_get(url: str) -> Optional[dict]:
+    raw = _cache.get(url)
+    if raw is None:
+        return None
+    _cache.move_to_end(url)
+    return json.loads(raw)
+
+def _cache_put(url: str, message: dict) -> None:
+    _cache[url] = json.dumps(message)
+    _cache.move_to_end(url)
+    if len(_cache) > _CACHE_MAXSIZE:
+        _cache.popitem(last=False)
+
+def _crossref_url(identifier: str) -> str:
     doi = identifier
     if "doi.org/" in identifier:
         doi = identifier.split("doi.org/")[-1]
-    url = f"https://api.crossref.org/works/{doi}"
-    r = requests.get(url, timeout=20)
-    r.raise_for_status()
-    return r.json().get("message", {})
+    return f"https://api.crossref.org/works/{doi}"
+
+async def _crossref_lookup(client: httpx.AsyncClient, sem: asyncio.Semaphore, identifier: str):
+    url = _crossref_url(identifier)
+    message = _cache_get(url)
+    if message is None:
+        async with sem:
+            r = await client.get(url, timeout=20)
+        r.raise_for_status()
+        message = r.json().get("message", {})
+        _cache_put(url, message)
+    return message
 
 def _to_bibtex(message: dict) -> str:
     authors = message.get("author", [])
@@ -24,10 +58,15 @@ def _to_bibtex(message: dict) -> str:
   doi={{ {doi} }}
 }}"""
 
-def build_citations(identifiers: List[str], style: str = "bibtex") -> str:
-    messages = [_crossref_lookup(x) for x in identifiers]
+def _format_citations(messages: List[dict], style: str) -> str:
     if style.lower() == "bibtex":
         return "\n\n".join(_to_bibtex(m) for m in messages)
     else:
-        import json
         return json.dumps(messages, indent=2)
+
+async def build_citations(identifiers: List[str], style: str = "bibtex", max_concurrency: int = 10) -> str:
+    """Look up all identifiers concurrently on the shared client and format them."""
+    sem = asyncio.BoundedSemaphore(max_concurrency)
+    client = get_async_client()
+    messages = await asyncio.gather(*(_crossref_lookup(client, sem, x) for x in identifiers))
+    return _format_citations(list(messages), style)
@@ -1,16 +1,31 @@
+from itertools import islice
 from typing import List, Dict
 import arxiv
 
+# Upper bound on up-front result slots; max_results comes straight from tool input
+_MAX_PREALLOC = 1000
+
 def arxiv_search(query: str, max_results: int = 10) -> List[Dict]:
+    if max_results < 0:
+        raise ValueError("max_results must be >= 0")
     search = arxiv.Search(query=query, max_results=max_results, sort_by=arxiv.SortCriterion.Relevance)
-    results = []
-    for r in search.results():
-        results.append({
+    prealloc = min(max_results, _MAX_PREALLOC)
+    results = [None] * prealloc
+    n = 0
+    for r in islice(search.results(), max_results):
+        published = r.published
+        item = {
             "title": r.title,
             "authors": [a.name for a in r.authors],
-            "published": r.published.isoformat() if r.published else None,
+            "published": published.isoformat() if published else None,
             "summary": r.summary,
             "pdf_url": r.pdf_url,
             "entry_id": r.entry_id,
-        })
+        }
+        if n < prealloc:
+            results[n] = item
+        else:
+            results.append(item)
+        n += 1
+    del results[n:]
     return results
@@ -1,13 +1,17 @@
 
 import os
 from typing import List, Dict
-import requests
 from duckduckgo_search import DDGS
 
+try:
+    from .._http import HTTP
+except ImportError:
+    from _http import HTTP
+
 def web_search(query: str, max_results: int = 10) -> List[Dict]:
     tavily_key = os.environ.get("TAVILY_API_KEY")
     if tavily_key:
-        resp = requests.post(
+        resp = HTTP.post(
             "https://api.tavily.com/search",
             json={"api_key": tavily_key, "query": query, "max_results": max_results},
             timeout=30
@@ -1,11 +1,36 @@
 # src/mcp_server/embeddings.py
+import asyncio
+import functools
+import hashlib
 import os
-from typing import List
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Default location of the persistent embedding cache (shared across runs)
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "mcp", "embeddings.sqlite")
+
+# Stay below SQLite's limit on bound parameters per statement
+_SQLITE_MAX_VARS = 900
 
 class Embeddings:
-    def __init__(self, backend: str = "openai", model_name: str = "text-embedding-3-small"):
+    def __init__(
+        self,
+        backend: str = "openai",
+        model_name: str = "text-embedding-3-small",
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+        batch_size: int = 96,
+        max_batch_tokens: int = 300_000,
+        max_concurrency: int = 8,
+    ):
         self.backend = backend
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self._encoding = False  # resolved lazily by _get_encoding()
 
         if backend != "openai":
             raise ValueError("This wrapper currently supports only the OpenAI backend.")
@@ -29,32 +54,210 @@ class Embeddings:
             except Exception as e:
                 raise RuntimeError("Could not import OpenAI client library") from e
 
+        # Persistent cache keyed by (model, sha256(text)); pass cache_path=None to disable
+        self._cache = self._open_cache(cache_path) if cache_path else None
+        # The connection is shared with ingest worker threads
+        self._cache_lock = threading.Lock()
+
+        # Per-instance memo in front of the disk cache for single-text lookups
+        self._embed_single_cached = functools.lru_cache(maxsize=4096)(self._embed_single)
+
+    @staticmethod
+    def _open_cache(path: str) -> Optional[sqlite3.Connection]:
+        """Open the cache database, or return None (cache disabled) if it can't be created."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb ("
+                "model TEXT, hash BLOB, vec BLOB, PRIMARY KEY(model, hash))"
+            )
+            conn.commit()
+        except (OSError, sqlite3.Error):
+            return None
+        return conn
+
+    def _cache_get(self, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        """Look up cached vectors for the given text hashes."""
+        found: Dict[bytes, List[float]] = {}
+        if self._cache is None or not hashes:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        with self._cache_lock:
+            for i in range(0, len(unique), _SQLITE_MAX_VARS):
+                part = unique[i:i + _SQLITE_MAX_VARS]
+                placeholders = ",".join("?" * len(part))
+                try:
+                    rows = self._cache.execute(
+                        f"SELECT hash, vec FROM emb WHERE model=? AND hash IN ({placeholders})",
+                        [self.model_name, *part],
+                    ).fetchall()
+                except sqlite3.Error:
+                    # Treat an unreadable cache as a miss
+                    break
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _cache_put(self, hashes: List[bytes], vecs: List[List[float]]) -> None:
+        if self._cache is None or not hashes:
+            return
+        rows = [
+            (self.model_name, h, np.asarray(v, dtype=np.float32).tobytes())
+            for h, v in zip(hashes, vecs)
+        ]
+        with self._cache_lock:
+            try:
+                self._cache.executemany("INSERT OR REPLACE INTO emb (model, hash, vec) VALUES (?, ?, ?)", rows)
+                self._cache.commit()
+            except sqlite3.Error:
+                # Best-effort: a full or read-only cache must not fail the embed
+                self._cache.rollback()
+
+    def _split_cached(self, texts: List[str]):
+        """
+        Pre-allocate the output list, fill it from the cache and return it along
+        with the cache misses as {hash: [indices]} (each distinct text once).
+        """
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        hashes = [hashlib.sha256(t.encode("utf-8")).digest() for t in texts]
+        cached = self._cache_get(hashes)
+
+        miss_idx: Dict[bytes, List[int]] = {}
+        for i, h in enumerate(hashes):
+            vec = cached.get(h)
+            if vec is not None:
+                out[i] = vec
+            else:
+                miss_idx.setdefault(h, []).append(i)
+        return out, miss_idx
+
+    def _fill_misses(self, out, miss_idx: Dict[bytes, List[int]], vecs: List[List[float]]) -> None:
+        miss_hashes = list(miss_idx)
+        for h, vec in zip(miss_hashes, vecs):
+            for i in miss_idx[h]:
+                out[i] = vec
+        self._cache_put(miss_hashes, vecs)
+
     def embed(self, texts: List[str]) -> List[List[float]]:
         """
         Return list of embeddings (one list of floats per input text).
+        Texts already present in the on-disk cache are not sent to the API.
+        """
+        if len(texts) == 1:
+            # Single-text calls (e.g. query questions) repeat often within a session
+            return [list(self._embed_single_cached(texts[0]))]
+        out, miss_idx = self._split_cached(texts)
+        if miss_idx:
+            vecs = self._embed_remote([texts[idx[0]] for idx in miss_idx.values()])
+            self._fill_misses(out, miss_idx, vecs)
+        return out
+
+    def _embed_single(self, text: str) -> Tuple[float, ...]:
+        out, miss_idx = self._split_cached([text])
+        if miss_idx:
+            self._fill_misses(out, miss_idx, self._embed_remote([text]))
+        return tuple(out[0])
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async variant of embed(): cache misses are sent as concurrent batch
+        requests, at most max_concurrency in flight at once.
+        """
+        out, miss_idx = self._split_cached(texts)
+        if miss_idx:
+            vecs = await self._aembed_remote([texts[idx[0]] for idx in miss_idx.values()])
+            self._fill_misses(out, miss_idx, vecs)
+        return out
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split texts into request-sized batches: at most batch_size inputs each,
+        and (when tiktoken is available) at most max_batch_tokens tokens each.
+        """
+        encoding = self._get_encoding()
+        batches: List[List[str]] = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            if encoding is None:
+                batches.append(batch)
+                continue
+            current: List[str] = []
+            current_tokens = 0
+            for t in batch:
+                n = len(encoding.encode(t, disallowed_special=()))
+                if current and current_tokens + n > self.max_batch_tokens:
+                    batches.append(current)
+                    current, current_tokens = [], 0
+                current.append(t)
+                current_tokens += n
+            if current:
+                batches.append(current)
+        return batches
+
+    def _get_encoding(self):
+        """Return the tiktoken encoding for the model, or None if tiktoken is unavailable."""
+        if self._encoding is False:
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                self._encoding = None
+        return self._encoding
+
+    @staticmethod
+    def _parse_response(resp) -> List[List[float]]:
+        # Modern client: resp.data is a sequence of objects/dicts with 'embedding'
+        out = []
+        for d in getattr(resp, "data", resp.get("data") if isinstance(resp, dict) else []):
+            # d may be dict or object with attribute
+            if isinstance(d, dict):
+                emb = d.get("embedding")
+            else:
+                emb = getattr(d, "embedding", None)
+            if emb is None:
+                raise RuntimeError("Unexpected embedding response shape from OpenAI client")
+            out.append(emb)
+        return out
+
+    def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        """
+        Call the OpenAI embeddings API for the given texts, one request per batch.
         Works with modern OpenAI client (1.x).
         """
-        if self._mode == "client":
-            # Modern client: resp.data is a sequence of objects/dicts with 'embedding'
-            resp = self._client.embeddings.create(model=self.model_name, input=texts)
-            out = []
-            for d in getattr(resp, "data", resp.get("data") if isinstance(resp, dict) else []):
-                # d may be dict or object with attribute
-                if isinstance(d, dict):
-                    emb = d.get("embedding")
-                else:
-                    emb = getattr(d, "embedding", None)
-                if emb is None:
-                    raise RuntimeError("Unexpected embedding response shape from OpenAI client")
-                out.append(emb)
-            return out
-
-        else:
-            # Legacy (old openai <1.0)
-            # Keep for backward compatibility — but if openai>=1.0 is installed this branch likely won't run.
-            resp = self._client.Embedding.create(model=self.model_name, input=texts)
-            data = resp.get("data", [])
-            return [item.get("embedding") for item in data]
+        out: List[List[float]] = []
+        for batch in self._batches(texts):
+            if self._mode == "client":
+                resp = self._client.embeddings.create(model=self.model_name, input=batch)
+                out.extend(self._parse_response(resp))
+            else:
+                # Legacy (old openai <1.0)
+                # Keep for backward compatibility — but if openai>=1.0 is installed this branch likely won't run.
+                resp = self._client.Embedding.create(model=self.model_name, input=batch)
+                data = resp.get("data", [])
+                out.extend(item.get("embedding") for item in data)
+        return out
+
+    async def _aembed_remote(self, texts: List[str]) -> List[List[float]]:
+        if self._mode != "client":
+            # Legacy module has no async client; run the blocking path off the loop
+            return await asyncio.to_thread(self._embed_remote, texts)
+
+        from openai import AsyncOpenAI
+        sem = asyncio.BoundedSemaphore(self.max_concurrency)
+
+        # A client per call: its connection pool is bound to the running event loop
+        async with AsyncOpenAI() as client:
+            async def _one(batch: List[str]) -> List[List[float]]:
+                async with sem:
+                    resp = await client.embeddings.create(model=self.model_name, input=batch)
+                return self._parse_response(resp)
+
+            results = await asyncio.gather(*(_one(b) for b in self._batches(texts)))
+        return [vec for batch_vecs in results for vec in batch_vecs]
 
     # convenience alias for code that expects .encode()
     def encode(self, texts: List[str]) -> List[List[float]]:
@@ -1,54 +1,191 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
 import os
 import re
+import tempfile
 import uuid
-from typing import Callable, List
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Tuple
+from urllib.parse import urlparse
 import fitz  # PyMuPDF
 
-def fetch_pdf_file(url: str, download_dir: str) -> str:
-    import requests
+try:
+    from .._http import get_async_client
+    from .._ratelimit import DomainLimiter
+except ImportError:
+    from _http import get_async_client
+    from _ratelimit import DomainLimiter
+
+_DOWNLOAD_CHUNK = 1 << 20
+_TOKEN_RE = re.compile(r"\S+\s*")
+_UPSERT_BATCH = 1024
+
+# Shared across fetch_pdf tool calls so per-host rate limits apply across
+# calls; created lazily inside the server's event loop.
+_limiter = None
+
+def _get_limiter() -> DomainLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = DomainLimiter(min_interval_ms=200, max_concurrency=16)
+    return _limiter
+
+def _pdf_path(url: str, download_dir: str) -> str:
     os.makedirs(download_dir, exist_ok=True)
     filename = url.split("/")[-1] or f"{uuid.uuid4().hex}.pdf"
     if not filename.lower().endswith(".pdf"):
         filename += ".pdf"
-    path = os.path.join(download_dir, filename)
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    with open(path, "wb") as f:
-        f.write(r.content)
+    return os.path.join(download_dir, filename)
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+async def fetch_pdf_file(url: str, download_dir: str) -> str:
+    path = _pdf_path(url, download_dir)
+    # A unique temp file per download, so concurrent fetches of the same URL
+    # (or URLs sharing a basename) never write into the same file. It only
+    # replaces the target once the whole body has arrived.
+    fd, part = tempfile.mkstemp(dir=download_dir, prefix=os.path.basename(path) + ".", suffix=".part")
+    try:
+        f = os.fdopen(fd, "wb")
+        try:
+            async with _get_limiter().limit(urlparse(url).netloc):
+                async with get_async_client().stream("GET", url, timeout=60) as r:
+                    r.raise_for_status()
+                    # Disk writes go through a thread so the event loop keeps serving other calls
+                    async for block in r.aiter_bytes(_DOWNLOAD_CHUNK):
+                        await asyncio.to_thread(f.write, block)
+        finally:
+            await asyncio.to_thread(f.close)
+        os.replace(part, path)
+    except BaseException:
+        _remove_quietly(part)
+        raise
     return path
 
+# Plain-text extraction flags without ligature preservation (cheaper than get_text's defaults)
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+
+# Extracted text is cached per file; bump the version when extraction changes
+_TEXT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp", "pdf_text")
+_TEXT_CACHE_VERSION = 1
+
+def _text_cache_path(path: str) -> str:
+    # Keyed on path, size and mtime so a hit needs no read of the PDF itself
+    st = os.stat(path)
+    key = f"{_TEXT_CACHE_VERSION}:{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return os.path.join(_TEXT_CACHE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".txt")
+
 def _extract_text_from_pdf(path: str) -> str:
-    texts = []
+    cache_path = _text_cache_path(path)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        pass
+    text = _parse_pdf_text(path)
+    # Write then rename so concurrent workers never see a partial file. The
+    # cache is best-effort: an unwritable cache dir must not fail the ingest.
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(_TEXT_CACHE_DIR, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, cache_path)
+    except OSError:
+        _remove_quietly(tmp)
+    return text
+
+def _parse_pdf_text(path: str) -> str:
+    # Pages are written straight into one buffer rather than joined from a list
+    buf = io.StringIO()
     with fitz.open(path) as doc:
         for page in doc:
-            texts.append(page.get_text("text"))
-    return "\n".join(texts)
+            if page.number:
+                buf.write("\n")
+            buf.write(page.get_textpage(flags=_TEXT_FLAGS).extractText())
+    return buf.getvalue()
 
 def _chunk_text(text: str, chunk_size: int = 800, overlap: int = 120) -> List[str]:
-    tokens = re.findall(r"\S+\s*", text)
-    chunks = []
-    i = 0
-    while i < len(tokens):
-        chunk = "".join(tokens[i:i+chunk_size])
-        chunks.append(chunk.strip())
-        i += chunk_size - overlap
-    return chunks
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap must be smaller than chunk_size")
+    tokens = _TOKEN_RE.findall(text)
+    return ["".join(tokens[i:i + chunk_size]).strip() for i in range(0, len(tokens), step)]
+
+def _extract_and_chunk(path: str) -> Tuple[str, List[str]]:
+    """Process-pool worker: parse one PDF and return its chunks."""
+    return path, _chunk_text(_extract_text_from_pdf(path))
+
+def _parse_pdfs(pdf_paths: List[str]) -> Iterator[Tuple[str, List[str]]]:
+    """Parse PDFs in parallel across cores, yielding (path, chunks) in input order."""
+    if len(pdf_paths) <= 1:
+        # Not worth spinning up worker processes
+        yield from map(_extract_and_chunk, pdf_paths)
+        return
+    workers = min(os.cpu_count() or 1, len(pdf_paths))
+    # spawn: forking a process that has already loaded MuPDF is not safe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        yield from executor.map(_extract_and_chunk, pdf_paths)
 
 def ingest_folder(path: str, embeddings, store, progress_cb: Callable[[str], None] | None = None) -> int:
-    total_chunks = 0
-    for root, _, files in os.walk(path):
-        for name in files:
-            if name.lower().endswith(".pdf"):
-                full = os.path.join(root, name)
-                if progress_cb:
-                    progress_cb(f"Parsing {full}")
-                text = _extract_text_from_pdf(full)
-                chunks = _chunk_text(text)
-                if not chunks:
-                    continue
-                vecs = embeddings.encode(chunks)  # not used directly; Chroma can accept documents and perform its own encodes depending on setup
-                ids = [f"{uuid.uuid4().hex}-{i}" for i in range(len(chunks))]
-                metas = [{"source": full, "chunk_index": i} for i in range(len(chunks))]
-                store.add(ids, chunks, metas)
-                total_chunks += len(chunks)
-    return total_chunks
+    pdf_paths = [
+        os.path.join(root, name)
+        for root, _, files in os.walk(path)
+        for name in files
+        if name.lower().endswith(".pdf")
+    ]
+    # Chunks are keyed by content hash so re-ingesting is idempotent;
+    # identical chunks (within or across files) are stored once.
+    all_chunks: List[str] = []
+    all_ids: List[str] = []
+    all_metas: List[dict] = []
+    seen = set()
+    for full, chunks in _parse_pdfs(pdf_paths):
+        if progress_cb:
+            progress_cb(f"Parsed {full}")
+        for i, chunk in enumerate(chunks):
+            chunk_id = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            all_chunks.append(chunk)
+            all_ids.append(chunk_id)
+            all_metas.append({"source": full, "chunk_index": i})
+    if not all_chunks:
+        return 0
+    # Batches span files; each batch is written while the next one embeds
+    if progress_cb:
+        progress_cb(f"Embedding {len(all_chunks)} chunks")
+    asyncio.run(_embed_and_store(embeddings, store, all_ids, all_chunks, all_metas))
+    return len(all_chunks)
+
+async def _embed_and_store(embeddings, store, ids: List[str], chunks: List[str], metas: List[dict]) -> None:
+    """Embed in upsert-sized batches, handing each to a background writer thread."""
+    loop = asyncio.get_running_loop()
+    # A single worker keeps writes in order
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending = []
+        try:
+            for i in range(0, len(chunks), _UPSERT_BATCH):
+                j = i + _UPSERT_BATCH
+                vecs = await embeddings.aembed(chunks[i:j])
+                # Surface a failed write before paying for more embeddings
+                for fut in pending:
+                    if fut.done():
+                        fut.result()
+                pending = [fut for fut in pending if not fut.done()]
+                pending.append(loop.run_in_executor(writer, store.add, ids[i:j], chunks[i:j], metas[i:j], vecs))
+            await asyncio.gather(*pending)
+        except BaseException:
+            # Drop queued writes and let the running one finish before re-raising
+            for fut in pending:
+                fut.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
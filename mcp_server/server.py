@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -67,6 +68,11 @@ class IngestFolderInput(BaseModel):
 class QueryInput(BaseModel):
     question: str = Field(..., description="Question to query")
     top_k: int = Field(5, description="Number of top results")
+    use_cache: bool = Field(
+        False,
+        description="Reuse results of a recent near-identical question (cosine >= 0.97); "
+                    "skips the Chroma search but may return another question's chunks",
+    )
 
 class CiteInput(BaseModel):
     doi_or_url_list: List[str] = Field(..., description="List of DOIs or URLs")
@@ -118,7 +124,7 @@ async def search_web(input: WebSearchInput) -> dict:
 async def fetch_pdf(input: FetchInput) -> dict:
     """Download and parse a PDF from a URL"""
     try:
-        saved = fetch_pdf_file(input.url, CONFIG["download_dir"])
+        saved = await fetch_pdf_file(input.url, CONFIG["download_dir"])
         return {"status": "success", "file": saved}
     except Exception as e:
         return {"error": f"Failed to fetch PDF: {str(e)}"}
@@ -134,7 +140,8 @@ async def ingest_folder(input: IngestFolderInput) -> dict:
         def progress_cb(msg: str):
             print(f"Progress: {msg}", file=sys.stderr)
         
-        n = ingest_folder_func(input.path, embeddings, store, progress_cb=progress_cb)
+        # Runs in a worker thread so its own event loop (for concurrent embedding) can start
+        n = await asyncio.to_thread(ingest_folder_func, input.path, embeddings, store, progress_cb=progress_cb)
         return {
             "status": "success",
             "ingested_chunks": n,
@@ -149,7 +156,7 @@ async def query_memory(input: QueryInput) -> dict:
     try:
         embeddings = _get_embeddings()
         store = _get_store()
-        results = store.query(input.question, embeddings, top_k=input.top_k)
+        results = store.query(input.question, embeddings, top_k=input.top_k, use_cache=input.use_cache)
         return {"status": "success", "results": results}
     except Exception as e:
         return {"error": f"Failed to query memory: {str(e)}"}
@@ -158,7 +165,7 @@ async def query_memory(input: QueryInput) -> dict:
 async def make_citations(input: CiteInput) -> dict:
     """Return citations (bibtex by default) for a list of DOIs or URLs"""
     try:
-        citations = build_citations(input.doi_or_url_list, style=input.style)
+        citations = await build_citations(input.doi_or_url_list, style=input.style)
         return {"status": "success", "citations": citations}
     except Exception as e:
         return {"error": f"Failed to generate citations: {str(e)}"}
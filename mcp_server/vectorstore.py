@@ -1,9 +1,20 @@
-from typing import List, Dict, Any
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
 class VectorStore:
-    def __init__(self, path: str = ".chroma", collection_name: str = "papers"):
+    def __init__(
+        self,
+        path: str = ".chroma",
+        collection_name: str = "papers",
+        sem_cache_size: int = 256,
+        sem_cache_threshold: float = 0.97,
+        sem_cache_ttl_s: float = 600.0,
+    ):
         # Fixed parameter name to match what's used in server.py
         # Persistent client with disk storage
         self.client = chromadb.PersistentClient(
@@ -12,18 +23,62 @@ class VectorStore:
         )
         self.collection = self.client.get_or_create_collection(name=collection_name)
 
-    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]):
-        """Add documents to the collection"""
-        self.collection.add(
+        # Semantic query cache: FIFO of (unit question vector, timestamp, top_k, results)
+        self._sem_cache: deque = deque(maxlen=sem_cache_size)
+        self.sem_cache_threshold = sem_cache_threshold
+        self.sem_cache_ttl_s = sem_cache_ttl_s
+        # add() runs on the ingest writer thread while queries run on the event loop
+        self._sem_lock = threading.Lock()
+        self._sem_generation = 0  # bumped on add() so in-flight queries don't cache stale results
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict], embeddings: Optional[List[List[float]]] = None):
+        """Upsert documents (with precomputed embeddings, if given) into the collection"""
+        self.collection.upsert(
             ids=ids, 
             documents=texts, 
+            embeddings=embeddings,
             metadatas=metadatas
         )
+        # New documents can change any cached answer
+        with self._sem_lock:
+            self._sem_cache.clear()
+            self._sem_generation += 1
+
+    def _sem_cache_lookup(self, q: np.ndarray, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for a near-duplicate question, if any."""
+        now = time.monotonic()
+        with self._sem_lock:
+            # Entries are in insertion order, so expired ones sit at the left
+            while self._sem_cache and now - self._sem_cache[0][1] > self.sem_cache_ttl_s:
+                self._sem_cache.popleft()
+            candidates = [e for e in self._sem_cache if e[2] == top_k]
+
+        if not candidates:
+            return None
+        sims = np.stack([e[0] for e in candidates]) @ q
+        best = int(np.argmax(sims))
+        if sims[best] >= self.sem_cache_threshold:
+            return candidates[best][3]
+        return None
 
-    def query(self, question: str, embeddings, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Query the collection for similar documents"""
+    def query(self, question: str, embeddings, top_k: int = 5, use_cache: bool = False) -> List[Dict[str, Any]]:
+        """
+        Query the collection for similar documents. With use_cache, a recent
+        near-identical question's results are reused (the question is still
+        embedded; only the Chroma search is skipped).
+        """
         # Generate embedding for the question
         question_embedding = embeddings.encode([question])[0]
+
+        q = np.asarray(question_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        generation = self._sem_generation
+        if use_cache:
+            cached = self._sem_cache_lookup(q, top_k)
+            if cached is not None:
+                return cached
         
         # Query using the embedding
         out = self.collection.query(
@@ -31,17 +86,22 @@ class VectorStore:
             n_results=top_k
         )
         
-        results = []
         # Safely handle the nested structure of results
         documents = out.get('documents', [[]])[0] if out.get('documents') else []
         metadatas = out.get('metadatas', [[]])[0] if out.get('metadatas') else []
         distances = out.get('distances', [[]])[0] if out.get('distances') else []
-        
-        for i in range(len(documents)):
-            results.append({
-                "text": documents[i] if i < len(documents) else "",
-                "meta": metadatas[i] if i < len(metadatas) else {},
-                "score": float(distances[i]) if i < len(distances) else 1.0
-            })
-        
+
+        # Pad missing fields once instead of bounds-checking per row
+        n = len(documents)
+        metadatas = list(metadatas[:n]) + [{}] * (n - len(metadatas))
+        scores = [float(d) for d in distances[:n]] + [1.0] * (n - len(distances))
+
+        results = [
+            {"text": d, "meta": m, "score": s}
+            for d, m, s in zip(documents, metadatas, scores)
+        ]
+
+        with self._sem_lock:
+            if generation == self._sem_generation:
+                self._sem_cache.append((q, time.monotonic(), top_k, results))
         return results